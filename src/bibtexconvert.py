@@ -1,27 +1,48 @@
 import re
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from types import MappingProxyType
+from typing import Iterable, List, Optional, Tuple
 from src.utils import Helpers # pylint: disable=no-name-in-module
 
+_YEAR = re.compile(r'\([^)]*?(\d{4})[^)]*\)')
+_DOT_TRANS = str.maketrans('', '', '.')
+_URL = re.compile(r'https?://\S*[^\s.,;]')
+
+# BibTeX field templates
+_HEADER_TMPL = '%s{%s, \n author = {%s}, \n title = {%s}, \n year = %s, \n '
+_PUBLISHER_TMPL = 'publisher = {%s}, \n '
+_LOCATION_TMPL = 'location = {%s}, \n '
+_JOURNAL_TMPLS = {
+    'j': 'journal = {%s}, \n',
+    'jp': 'journal = {%s}, \n pages = {%s}, \n ',
+    'jv': 'journal = {%s}, \n volume = {%s}, \n ',
+    'jvp': 'journal = {%s}, \n volume = {%s}, \n pages = {%s}, \n',
+    'jvnp': 'journal = {%s}, \n volume = {%s}, \n number = {%s}, \n pages = {%s}, \n',
+}
+_BOOKTITLE_TMPL = 'booktitle = {%s}, \n'
+_BOOKTITLE_PAGES_TMPL = 'booktitle = {%s}, \n pages = {%s}, \n'
+_HOWPUBLISHED_TMPL = 'howpublished = {%s}, \n'
+
 class ApaConverter():
     """Convert APA citation type to BibTeX"""
-    def __init__(self) -> None:
-        """Initialize module"""
-        self.bibtex_type_list = {
-                            'article': 'article, periodical, journal, magazine',
-                            'book': 'book, publications,  publication',
-                            'booklet': 'book, no publisher',
-                            #'conference': 'conference, paper', this var is outdated
-                            'inbook': 'section, chapter, book',
-                            'incollection': 'article, collection',
-                            'inproceedings': 'conference, paper',
-                            'manual': 'technical, manual',
-                            'masterthesis': 'Masters, thesis',
-                            'phdthesis': 'PhD, thesis',
-                            'proceedings': 'conference, proceedings',
-                            'techreport': 'technical, report, government, white paper',
-                            'unpublished': 'unpublished'
-                            }
-        self.location = False
+    __slots__ = ()
+
+    BIBTEX_TYPES = MappingProxyType({
+                    'article': 'article, periodical, journal, magazine',
+                    'book': 'book, publications,  publication',
+                    'booklet': 'book, no publisher',
+                    #'conference': 'conference, paper', this var is outdated
+                    'inbook': 'section, chapter, book',
+                    'incollection': 'article, collection',
+                    'inproceedings': 'conference, paper',
+                    'manual': 'technical, manual',
+                    'masterthesis': 'Masters, thesis',
+                    'phdthesis': 'PhD, thesis',
+                    'proceedings': 'conference, proceedings',
+                    'techreport': 'technical, report, government, white paper',
+                    'unpublished': 'unpublished'
+                    })
+    bibtex_type_list = BIBTEX_TYPES
 
     def extract_bibtex_type(self, input_text: str) -> str:
         """ Extract the bibtex type of the citation based on information in the citation
@@ -31,9 +52,10 @@ class ApaConverter():
         Returns:
             BibTeX type
         """
-        for bibtype, description in self.bibtex_type_list.items():
+        lowered = input_text.lower()
+        for bibtype, description in self.BIBTEX_TYPES.items():
             for phrase in description.split(','):
-                if phrase in input_text.lower():
+                if phrase in lowered:
                     return "@" + bibtype
         return "@misc"
 
@@ -49,86 +71,75 @@ class ApaConverter():
 
         if bibtex_type is None:
             bibtex_type = self.extract_bibtex_type(input_text)
-        elif bibtex_type not in self.bibtex_type_list:
+        elif bibtex_type not in self.BIBTEX_TYPES:
             raise NameError('This BibTeX type does not exist')
 
-
-        author = self.get_authors(input_text)
+        segments = Helpers.split_by_period(input_text)
+        author = self._get_authors(segments)
         title = self.get_title(input_text)
         year = self.get_year(input_text)
 
-        bibtex_name_author = author.split(', ', maxsplit=1)[0].lower()
-        if len(bibtex_name_author.split(' ')) > 1:
-            bibtex_name_author = bibtex_name_author.split(' ')[0]
-        if len(title.split(' ')) > 1:
-            bibtex_name_title = title.split(' ')[0].lower()
-        else:
-            bibtex_name_title = title.lower()
+        bibtex_name_author = author.partition(', ')[0].partition(' ')[0].lower()
+        bibtex_name_title = title.partition(' ')[0].lower()
         bibtex_name = ''.join([bibtex_name_author, year, bibtex_name_title])
-        full_bibtex = f"""{bibtex_type}{{{bibtex_name}, \n author = {{{author}}}, \n title = {{{title}}}, \n year = {year}, \n """
+        parts = [_HEADER_TMPL % (bibtex_type, bibtex_name, author, title, year)]
 
         # BibTeX for book types
 
         if bibtex_type == '@book':
-            publisher = self.get_publishers(input_text)
-            full_bibtex += f'publisher = {{{publisher}}}, \n '
-            if self.location:
-                full_bibtex += f'location = {{{self.location}}}, \n '
+            publisher, location = self._get_publishers(segments)
+            parts.append(_PUBLISHER_TMPL % (publisher,))
+            if location:
+                parts.append(_LOCATION_TMPL % (location,))
 
         # BibTeX for articles types
 
         if bibtex_type == '@article':
-            try:
-                journal, second = self.get_journal(input_text)
-                if '-' in second:
-                    second = Helpers.remove_non_numeric_chars(second)
-                    full_bibtex += f'journal = {{{journal}}}, \n pages = {{{second}}}, \n '
-                else:
-                    full_bibtex += f'journal = {{{journal}}}, \n volume = {{{second}}}, \n '
-            except ValueError:
-                try:
-                    journal, second, third = self.get_journal(input_text)
-                    if '(' in second:
-                        contains_page = second.split('(')
-                        volume = contains_page[0]
-                        number = contains_page[1].replace(')', '')
-                        third = third.replace('p ', '')
-                        full_bibtex += f'journal = {{{journal}}}, \n volume = {{{volume}}}, \n number = {{{number}}}, \n pages = {{{third}}}, \n'
-                    else:
-                        full_bibtex += f'journal = {{{journal}}}, \n volume = {{{second}}}, \n pages = {{{third}}}, \n'
-                except ValueError:
-                    journal = self.get_journal(input_text)
-                    full_bibtex += f'journal = {{{journal}}}, \n'
+            kind, *fields = self._get_journal(segments)
+            parts.append(_JOURNAL_TMPLS[kind] % tuple(fields))
 
         # BibTeX for conference proceedings
 
         if bibtex_type == '@inproceedings':
-            booktitle = self.get_booktitle(input_text)
+            booktitle = self._get_booktitle(segments)
             if '(' in booktitle:
                 segment = booktitle.split('(')
                 booktitle = segment[0].strip()
                 pages = segment[1].strip()
                 pages = Helpers.remove_non_numeric_chars(pages)
-                full_bibtex += f'booktitle = {{{booktitle}}}, \n pages = {{{pages}}}, \n'
+                parts.append(_BOOKTITLE_PAGES_TMPL % (booktitle, pages))
             else:
-                full_bibtex += f'booktitle = {{{booktitle}}}, \n'
+                parts.append(_BOOKTITLE_TMPL % (booktitle,))
 
         # BibTeX for misc types
         if bibtex_type == '@misc':
-            howpublished = self.get_howpublished(input_text)
-            print(howpublished)
+            howpublished = self._get_howpublished(segments)
             if howpublished is not None:
                 if Helpers.extract_url(howpublished):
-                    backslash_char = "\\"
-                    full_bibtex += f'howpublished = {{{howpublished.replace("http", f"{backslash_char}url http")}}}, \n'
-                else:
-                    full_bibtex += f'howpublished = {{{howpublished}}}, \n'
+                    howpublished = _URL.sub(r'\\url{\g<0>}', howpublished)
+                parts.append(_HOWPUBLISHED_TMPL % (howpublished,))
 
 
         # close out parentheses on all BibTeX types
-        full_bibtex += '}'
-        return full_bibtex
+        parts.append('}')
+        return ''.join(parts)
+
 
+    def convert_many(self, texts: Iterable[str], workers: Optional[int] = None) -> List[str]:
+        """Convert a batch of citations to bibtex
+
+        Args:
+            texts = the citations to convert
+            workers = number of worker processes, converts sequentially if None
+        Returns:
+            converted citations, in input order
+        """
+        texts = list(texts)
+        if workers is None:
+            return [self.convert(text) for text in texts]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.convert, texts,
+                                     chunksize=max(1, len(texts) // (workers * 8))))
 
     def get_title(self, input_text: str) -> Optional[str]:
         """Get title from apa citation
@@ -138,7 +149,16 @@ class ApaConverter():
         Returns:
             title of text
         """
-        title = input_text.split(').')[1].split('. ')[0].strip()
+        start = input_text.find(').')
+        if start < 0:
+            return None
+        start += 2
+        # title ends at the first '. ' or the next ').', whichever comes first
+        end = input_text.find(').', start)
+        stop = input_text.find('. ', start, None if end < 0 else end)
+        if stop >= 0:
+            end = stop
+        title = input_text[start:end if end >= 0 else None].strip()
         if title:
             return title
         return None
@@ -151,8 +171,17 @@ class ApaConverter():
         Returns:
             title of booktitle
         """
-        string = Helpers.split_by_period(input_text)[2]
-        return string
+        return self._get_booktitle(Helpers.split_by_period(input_text))
+
+    def _get_booktitle(self, segments: List[str]) -> Optional[str]:
+        """Get booktitle from already split citation
+
+        Args:
+            segments = the citation split by period
+        Returns:
+            title of booktitle
+        """
+        return segments[2]
 
 
     def get_year(self, input_text) -> Optional[str]:
@@ -163,15 +192,9 @@ class ApaConverter():
         Returns:
             year
         """
-        pattern = r'\((.*?)\)'
-        match = re.search(pattern, input_text)
+        match = _YEAR.search(input_text)
         if match:
-            content_within_parentheses = match.group(1)
-            pattern_numbers = r'\d{4}'
-            match_numbers = re.search(pattern_numbers, content_within_parentheses)
-            if match_numbers:
-                consecutive_numbers = match_numbers.group()
-                return consecutive_numbers
+            return match.group(1)
         return None
 
     def get_authors(self, input_text: str) -> str:
@@ -182,7 +205,17 @@ class ApaConverter():
         Returns:
             author names in BibTeX format
         """
-        string = Helpers.split_by_period(input_text)[0]
+        return self._get_authors(Helpers.split_by_period(input_text))
+
+    def _get_authors(self, segments: List[str]) -> str:
+        """Extract author names from already split citation
+
+        Args:
+            segments = the citation split by period
+        Returns:
+            author names in BibTeX format
+        """
+        string = segments[0]
         authors = []
     
         string = string.split(' (', 1)[0]
@@ -197,44 +230,66 @@ class ApaConverter():
 
         return ' and '.join(authors)
 
-    def get_publishers(self, input_text: str) -> str:
+    def get_publishers(self, input_text: str) -> Tuple[str, Optional[str]]:
         """Extract publishers
 
         Args:
             input_text = the entire citation
         Returns:
-            publisher, without location
+            publisher, without location, and location if given
         """
-        string = Helpers.split_by_period(input_text)[2]
-        location_publisher = string.split(':')
+        return self._get_publishers(Helpers.split_by_period(input_text))
+
+    def _get_publishers(self, segments: List[str]) -> Tuple[str, Optional[str]]:
+        """Extract publishers from already split citation
+
+        Args:
+            segments = the citation split by period
+        Returns:
+            publisher, without location, and location if given
+        """
+        string = segments[2]
+        location_publisher = [part.strip() for part in string.split(':')]
         if len(location_publisher) > 1:
-            self.location = location_publisher[0].strip()
-            return location_publisher[1].strip().replace('.', '')
-        self.location = False
-        return location_publisher[0].strip().replace('.', '')
+            return location_publisher[1].translate(_DOT_TRANS), location_publisher[0]
+        return location_publisher[0].translate(_DOT_TRANS), None
     
-    def get_journal(self, input_text: str) -> str:
-        """Extract journal name
+    def get_journal(self, input_text: str) -> tuple:
+        """Extract journal name and, where present, volume, number and pages
 
         Args:
             input_text = the entire citation
         Returns:
-            journal name
+            (kind, *fields), kind being one of 'j', 'jp', 'jv', 'jvp' or 'jvnp'
+            naming the fields that follow (journal, volume, number, pages)
+        """
+        return self._get_journal(Helpers.split_by_period(input_text))
+
+    def _get_journal(self, segments: List[str]) -> tuple:
+        """Extract journal fields from already split citation
+
+        Args:
+            segments = the citation split by period
+        Returns:
+            (kind, *fields), as for get_journal
         """
-        string = Helpers.split_by_period(input_text)[2]
-        string = string.split(',')
-        if len(string) == 3:
-            journal = string[0]
-            volume = string[1]
-            pages = string[2]
-            return journal.strip(), volume.strip(), pages.strip().replace('.', '')
-        if len(string) == 2:
-            journal = string[0].strip().replace('.', '')
-            output = string[1].strip().replace('.', '')
-            return journal, output
-
-        journal = string[0]
-        return journal.strip().replace('.', '')
+        string = segments[2]
+        parts = [part.strip() for part in string.split(',')]
+        if len(parts) == 3:
+            journal, volume, pages = parts
+            pages = pages.translate(_DOT_TRANS)
+            if '(' in volume:
+                volume, number = volume.split('(')[:2]
+                return 'jvnp', journal, volume, number.replace(')', ''), pages.replace('p ', '')
+            return 'jvp', journal, volume, pages
+        if len(parts) == 2:
+            journal = parts[0].translate(_DOT_TRANS)
+            second = parts[1].translate(_DOT_TRANS)
+            if '-' in second:
+                return 'jp', journal, Helpers.remove_non_numeric_chars(second)
+            return 'jv', journal, second
+
+        return 'j', parts[0].translate(_DOT_TRANS)
 
     def get_howpublished(self, input_text: str) -> str:
         """Extract publishing medium for @misc
@@ -244,8 +299,18 @@ class ApaConverter():
         Returns:
             journal name
         """
+        return self._get_howpublished(Helpers.split_by_period(input_text))
+
+    def _get_howpublished(self, segments: List[str]) -> Optional[str]:
+        """Extract publishing medium from already split citation
+
+        Args:
+            segments = the citation split by period
+        Returns:
+            publishing medium, None if absent
+        """
         try:
-            string = Helpers.split_by_period(input_text)[3]
+            string = segments[3]
             return string
         except IndexError:
             return None